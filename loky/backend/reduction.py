@@ -258,13 +258,13 @@ def loads(buf):
     return pickle_loads(buf)
 
 
-def dump(obj, file, reducers=None, protocol=None):
+def dump(obj, file, reducers=None, protocol=HIGHEST_PROTOCOL):
     '''Replacement for pickle.dump() using _LokyPickler.'''
     global _LokyPickler
     _LokyPickler(file, reducers=reducers, protocol=protocol).dump(obj)
 
 
-def dumps(obj, reducers=None, protocol=None):
+def dumps(obj, reducers=None, protocol=HIGHEST_PROTOCOL):
     global _LokyPickler
 
     buf = io.BytesIO()
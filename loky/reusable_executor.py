@@ -107,6 +107,13 @@ class _ReusablePoolExecutor(ProcessPoolExecutor):
                               kill_workers=False, reuse="auto",
                               job_reducers=None, result_reducers=None,
                               initializer=None, initargs=(), env=None):
+        # Validate the arguments before touching the singleton executor so
+        # that an invalid call never waits for the lock or spawns workers.
+        if max_workers is not None and max_workers <= 0:
+            raise ValueError(
+                "max_workers must be greater than 0, got {}."
+                .format(max_workers))
+
         with _executor_lock:
             global _executor, _executor_kwargs
             executor = _executor
@@ -116,10 +123,6 @@ class _ReusablePoolExecutor(ProcessPoolExecutor):
                     max_workers = executor._max_workers
                 else:
                     max_workers = cpu_count()
-            elif max_workers <= 0:
-                raise ValueError(
-                    "max_workers must be greater than 0, got {}."
-                    .format(max_workers))
 
             if isinstance(context, STRING_TYPE):
                 context = get_context(context)
@@ -208,7 +211,8 @@ class _ReusablePoolExecutor(ProcessPoolExecutor):
 
             self._adjust_process_count()
             processes = list(self._processes.values())
-            while not all([p.is_alive() for p in processes]):
+            while (not all([p.is_alive() for p in processes])
+                   and not self._flags.broken):
                 time.sleep(1e-3)
 
     def _wait_job_completion(self):
@@ -3,13 +3,13 @@ import os
 import sys
 import time
 import math
-import psutil
 import pytest
 import threading
 
 from loky._base import TimeoutError
 from loky.backend import get_context
 from loky import get_reusable_executor, cpu_count
+from loky.reusable_executor import _ReusablePoolExecutor
 
 
 # Compat Travis
@@ -34,6 +34,7 @@ def initializer_event(event):
 
 def _direct_children_with_cmdline(p):
     """Helper to fetch cmdline from children process list"""
+    import psutil
     children_with_cmdline = []
     for c in p.children():
         try:
@@ -69,6 +70,7 @@ def _running_children_with_cmdline(p):
 
 def _check_subprocesses_number(executor, expected_process_number=None,
                                expected_max_process_number=None, patience=100):
+    import psutil
     # Wait for terminating processes to disappear
     children_cmdlines = _running_children_with_cmdline(psutil.Process())
     pids_cmdlines = [(c.pid, cmdline) for c, cmdline in children_cmdlines]
@@ -176,6 +178,7 @@ class ExecutorMixin:
 
     @classmethod
     def check_no_running_workers(cls, patience=5, sleep_duration=0.01):
+        import psutil
         deadline = time.time() + patience
 
         while time.time() <= deadline:
@@ -202,8 +205,12 @@ class ReusableExecutorMixin:
     def setup_method(self, method):
         default_start_method = get_context().get_start_method()
         assert default_start_method == "loky", default_start_method
-        executor = get_reusable_executor(max_workers=2)
-        _check_executor_started(executor)
+        executor, is_reused = _ReusablePoolExecutor.get_reusable_executor(
+            max_workers=2)
+        if not is_reused:
+            # A reused executor already ran a task in the teardown of the
+            # previous test: only check new instances to save a round-trip.
+            _check_executor_started(executor)
         # There can be less than 2 workers because of the worker timeout
         _check_subprocesses_number(executor, expected_max_process_number=2)
 
@@ -213,8 +220,3 @@ class ReusableExecutorMixin:
         assert executor.submit(math.sqrt, 1).result() == 1
         # There can be less than 2 workers because of the worker timeout
         _check_subprocesses_number(executor, expected_max_process_number=2)
-
-    @classmethod
-    def teardown_class(cls):
-        executor = get_reusable_executor(max_workers=2)
-        executor.shutdown(wait=True)
@@ -1,3 +1,4 @@
+import os
 import sys
 import pytest
 import logging
@@ -5,9 +6,27 @@ import warnings
 from multiprocessing.util import log_to_stderr
 
 
+def _default_log_level():
+    """Log-level set by the LOKY_TEST_DEBUG environment variable"""
+    log_level = os.environ.get("LOKY_TEST_DEBUG")
+    if log_level is None:
+        return logging.WARNING
+    try:
+        return int(log_level)
+    except ValueError:
+        raise pytest.UsageError(
+            "LOKY_TEST_DEBUG should be an integer log-level, got {!r}."
+            .format(log_level))
+
+
 def pytest_addoption(parser):
-    parser.addoption("--loky-verbosity", type=int, default=logging.DEBUG,
-                     help="log-level: integer, SUBDEBUG(5) - INFO(20)")
+    # Logging is kept quiet by default as formatting and writing the debug
+    # messages to stderr slows down the dispatch of every task.
+    parser.addoption("--loky-verbosity", type=int,
+                     default=_default_log_level(),
+                     help="log-level: integer, SUBDEBUG(5) - WARNING(30). "
+                     "Defaults to the integer log-level set by the "
+                     "LOKY_TEST_DEBUG environment variable, or WARNING.")
     parser.addoption("--skip-high-memory", action="store_true",
                      help="skip high-memory test to avoid conflict on CI.")
 
@@ -30,6 +49,9 @@ def pytest_configure(config):
     config.addinivalue_line("markers", "timeout")
     config.addinivalue_line("markers", "broken_pool")
     config.addinivalue_line("markers", "high_memory")
+    # Registered by pytest-xdist when installed, declared here so that the
+    # test suite also runs without it.
+    config.addinivalue_line("markers", "xdist_group")
 
 
 def pytest_collection_modifyitems(config, items):
@@ -2,10 +2,11 @@ import os
 import sys
 import pytest
 import io
-from pickle import loads
+from pickle import loads, HIGHEST_PROTOCOL
 from tempfile import mkstemp
 from loky import set_loky_pickler
-from loky.backend.reduction import get_loky_pickler
+from loky.backend.reduction import (get_loky_pickler, get_loky_pickler_name,
+                                    dumps)
 
 
 from .utils import check_subprocess_call
@@ -46,6 +47,19 @@ class TestCloudpickleWrapper:
         assert isinstance(a, A)
         assert b == 42
 
+    @pytest.mark.parametrize('loky_pickler', ["cloudpickle", "pickle"])
+    def test_dumps_use_highest_protocol(self, loky_pickler):
+        # The pickle stream starts with the PROTO opcode followed by the
+        # protocol number.
+        previous_pickler = get_loky_pickler_name()
+        try:
+            set_loky_pickler(loky_pickler)
+            payload = bytearray(dumps(None))
+        finally:
+            set_loky_pickler(previous_pickler)
+        assert payload[0] == 0x80
+        assert payload[1] == HIGHEST_PROTOCOL
+
     def test_serialization_function_from_main(self):
         # check that the init_main_module parameter works properly
         # when using -c option, we don't need the safeguard if __name__ ..
@@ -565,7 +565,7 @@ class TestLokyBackend:
         sys.version_info[:3] <= (3, 5, 3),
         reason="early PyPy versions leak a file descriptor, see "
                "https://bitbucket.org/pypy/pypy/issues/3021")
-    def test_sync_object_handling(self):
+    def test_sync_object_handling(self, tmpdir):
         """Check the correct handling of semaphores and pipes with loky
 
         We use a Pipe object to check the stated of file descriptors in parent
@@ -583,7 +583,8 @@ class TestLokyBackend:
         # -> can be used on windows
         r, w = self._high_number_Pipe()
 
-        tmp_fname = "/tmp/foobar" if sys.platform != "win32" else ".foobar"
+        # Use a per-test file to avoid races with concurrent test runs
+        tmp_fname = str(tmpdir.join("foobar"))
         with open(tmp_fname, "w"):
             # Process creating semaphore and pipes before stopping
             started, stop = self.Event(), self.Event()
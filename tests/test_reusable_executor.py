@@ -2,11 +2,11 @@ import os
 import sys
 import gc
 import ctypes
-import psutil
 import pytest
 import warnings
 import threading
 from time import sleep
+from collections import namedtuple
 from multiprocessing import util, current_process
 from pickle import PicklingError, UnpicklingError
 from distutils.version import LooseVersion
@@ -17,11 +17,13 @@ from loky import get_reusable_executor
 from loky.process_executor import _RemoteTraceback, TerminatedWorkerError
 from loky.process_executor import BrokenProcessPool, ShutdownExecutorError
 from loky.reusable_executor import _ReusablePoolExecutor
+from loky.backend import get_context
+from loky.backend.compat import wait
 import cloudpickle
 
-from ._executor_mixin import ReusableExecutorMixin
-from .utils import TimingWrapper, id_sleep, check_python_subprocess_call
-from .utils import filter_match
+from ._executor_mixin import ReusableExecutorMixin, TIMEOUT
+from .utils import id_sleep, check_python_subprocess_call, filter_match
+from .utils import perf_counter
 
 cloudpickle_version = LooseVersion(cloudpickle.__version__)
 
@@ -40,13 +42,14 @@ try:
 except ImportError:
     np = None
 
+# Inputs of test_crash_races: number of workers and delays of the tasks
+RaceInputs = namedtuple("RaceInputs", ["n_proc", "delays"])
+
 # Backward compat for python2 cPickle module
 PICKLING_ERRORS = (PicklingError,)
-try:
+if sys.version_info[0] == 2:
     import cPickle
     PICKLING_ERRORS += (cPickle.PicklingError,)
-except ImportError:
-    pass
 
 
 def clean_warning_registry():
@@ -58,14 +61,49 @@ def clean_warning_registry():
             getattr(mod, reg).clear()
 
 
-def wait_dead(worker, n_tries=1000, delay=0.001):
+@pytest.fixture(scope="module", autouse=True)
+def shutdown_executor_at_module_end():
+    """Share the reusable executor between all the tests of this module.
+
+    The workers are only respawned when a test breaks or reconfigures the
+    executor and they are shut down once, after the last test of the module.
+    """
+    yield
+    get_reusable_executor(max_workers=2).shutdown(wait=True)
+
+
+@pytest.fixture
+def executor():
+    """Return the shared executor with 2 workers."""
+    return get_reusable_executor(max_workers=2)
+
+
+@pytest.fixture(scope="module", params=[1, 2, 5, 13])
+def race_inputs(request):
+    """Number of workers and delays of the tasks for test_crash_races"""
+    n_proc = request.param
+    delays = [.0001 * (j // 2) for j in range(2 * n_proc)]
+    return RaceInputs(n_proc, delays)
+
+
+def wait_dead(worker, timeout=TIMEOUT):
     """Wait for process pid to die"""
-    for i in range(n_tries):
-        if worker.exitcode is not None:
-            return
-        sleep(delay)
-    raise RuntimeError("Process %d failed to die for at least %0.3fs" %
-                       (worker.pid, delay * n_tries))
+    # The workers are children of this process: do not wait for them with
+    # psutil.Process.wait as it reaps them with os.waitpid, which hides their
+    # exitcode from the executor. The sentinel is ready as soon as the process
+    # exits, which avoids polling the exitcode with a fixed delay.
+    sentinel = getattr(worker, 'sentinel', None)
+    if sentinel is not None:
+        # Once the sentinel is ready, join returns as soon as the exiting
+        # process is reaped. A non-blocking join could miss the exitcode as
+        # the sentinel can be ready slightly before the process can be reaped.
+        # If the wait timed out, do not wait any longer.
+        worker.join(timeout if wait([sentinel], timeout=timeout) else 0)
+    else:
+        worker.join(timeout)
+    if worker.exitcode is None:
+        raise RuntimeError("Process %d failed to die for at least %0.3fs" %
+                           (worker.pid, timeout))
 
 
 def crash():
@@ -88,18 +126,34 @@ def sleep_then_check_pids_exist(arg):
     """Sleep for some time and the check if all the passed pids exist"""
     time, pids = arg
     sleep(time)
-    res = True
-    for p in pids:
-        res &= psutil.pid_exists(p)
-    return res
+    if sys.platform.startswith("linux"):
+        # A single scan of /proc is cheaper than checking each pid with psutil
+        running_pids = set(int(p) for p in os.listdir("/proc") if p.isdigit())
+        return all(p in running_pids for p in pids)
+    import psutil
+    return all(psutil.pid_exists(p) for p in pids)
 
 
-def kill_friend(pid, delay=0):
-    """Function that send SIGKILL at process pid"""
+def wait_then_check_pids_exist(arg):
+    """Wait on a barrier and then check if all the passed pids exist"""
+    barrier, pids = arg
+    barrier.wait(TIMEOUT)
+    return sleep_then_check_pids_exist((0, pids))
+
+
+def kill_friend(pid, event=None, delay=0):
+    """Function that send SIGKILL at process pid
+
+    If ``event`` is provided, it is set just before sending the signal so that
+    the caller can wait for the kill instead of sleeping.
+    """
     sleep(delay)
+    if event is not None:
+        event.set()
     try:
         os.kill(pid, SIGKILL)
     except (PermissionError, ProcessLookupError) as e:
+        import psutil
         if psutil.pid_exists(pid):
             util.debug("Fail to kill an alive process?!?")
             raise e
@@ -204,41 +258,69 @@ class CExitAtGCInWorker(object):
             c_exit()
 
 
+@pytest.mark.xdist_group(name="reusable_deadlock")
 class TestExecutorDeadLock(ReusableExecutorMixin):
 
+    # The arguments are built by a factory in each test so that the bad
+    # objects are not shared between the tests and are not created at
+    # collection time.
     crash_cases = [
         # Check problem occuring while pickling a task in
-        (id, (ExitAtPickle(),), PicklingError, None),
-        (id, (ErrorAtPickle(),), PicklingError, None),
+        pytest.param(id, lambda: (ExitAtPickle(),), PicklingError, None,
+                     id="task_pickle_exit"),
+        pytest.param(id, lambda: (ErrorAtPickle(),), PicklingError, None,
+                     id="task_pickle_error"),
         # Check problem occuring while unpickling a task on workers
-        (id, (ExitAtUnpickle(),), BrokenProcessPool, r"SystemExit"),
-        (id, (CExitAtUnpickle(),), TerminatedWorkerError, r"EXIT\(0\)"),
-        (id, (ErrorAtUnpickle(),), BrokenProcessPool, r"UnpicklingError"),
-        (id, (CrashAtUnpickle(),), TerminatedWorkerError, r"SIGSEGV"),
+        pytest.param(id, lambda: (ExitAtUnpickle(),), BrokenProcessPool,
+                     r"SystemExit", id="task_unpickle_exit"),
+        pytest.param(id, lambda: (CExitAtUnpickle(),), TerminatedWorkerError,
+                     r"EXIT\(0\)", id="task_unpickle_c_exit"),
+        pytest.param(id, lambda: (ErrorAtUnpickle(),), BrokenProcessPool,
+                     r"UnpicklingError", id="task_unpickle_error"),
+        pytest.param(id, lambda: (CrashAtUnpickle(),), TerminatedWorkerError,
+                     r"SIGSEGV", id="task_unpickle_crash"),
         # Check problem occuring during function execution on workers
-        (crash, (), TerminatedWorkerError, r"SIGSEGV"),
-        (exit, (), SystemExit, None),
-        (c_exit, (), TerminatedWorkerError, r"EXIT\(0\)"),
-        (raise_error, (RuntimeError,), RuntimeError, None),
+        pytest.param(crash, lambda: (), TerminatedWorkerError, r"SIGSEGV",
+                     id="func_crash"),
+        pytest.param(exit, lambda: (), SystemExit, None, id="func_exit"),
+        pytest.param(c_exit, lambda: (), TerminatedWorkerError, r"EXIT\(0\)",
+                     id="func_c_exit"),
+        pytest.param(raise_error, lambda: (RuntimeError,), RuntimeError, None,
+                     id="func_error"),
         # Check problem occuring while pickling a task result
         # on workers
-        (return_instance, (CrashAtPickle,), TerminatedWorkerError, r"SIGSEGV"),
-        (return_instance, (ExitAtPickle,), SystemExit, None),
-        (return_instance, (CExitAtPickle,), TerminatedWorkerError,
-         r"EXIT\(0\)"),
-        (return_instance, (ErrorAtPickle,), PicklingError, None),
+        pytest.param(return_instance, lambda: (CrashAtPickle,),
+                     TerminatedWorkerError, r"SIGSEGV",
+                     id="result_pickle_crash"),
+        pytest.param(return_instance, lambda: (ExitAtPickle,), SystemExit,
+                     None, id="result_pickle_exit"),
+        pytest.param(return_instance, lambda: (CExitAtPickle,),
+                     TerminatedWorkerError, r"EXIT\(0\)",
+                     id="result_pickle_c_exit"),
+        pytest.param(return_instance, lambda: (ErrorAtPickle,), PicklingError,
+                     None, id="result_pickle_error"),
         # Check problem occuring while unpickling a task in
         # the result_handler thread
-        (return_instance, (ExitAtUnpickle,), BrokenProcessPool, r"SystemExit"),
-        (return_instance, (ErrorAtUnpickle,), BrokenProcessPool,
-         r"UnpicklingError"),
+        pytest.param(return_instance, lambda: (ExitAtUnpickle,),
+                     BrokenProcessPool, r"SystemExit",
+                     id="result_unpickle_exit"),
+        pytest.param(return_instance, lambda: (ErrorAtUnpickle,),
+                     BrokenProcessPool, r"UnpicklingError",
+                     id="result_unpickle_error"),
     ]
-
-    @pytest.mark.parametrize("func, args, expected_err, match", crash_cases)
-    def test_crashes(self, func, args, expected_err, match):
+    if np is not None:
+        # Check problem occuring while unpickling a task that also holds a
+        # large buffer, serialized with the highest pickle protocol.
+        crash_cases.append(pytest.param(
+            id, lambda: ((np.ones(int(1e6)), CExitAtUnpickle()),),
+            TerminatedWorkerError, r"EXIT\(0\)",
+            id="task_unpickle_c_exit_numpy"))
+
+    @pytest.mark.parametrize("func, make_args, expected_err, match",
+                             crash_cases)
+    def test_crashes(self, executor, func, make_args, expected_err, match):
         """Test various reusable_executor crash handling"""
-        executor = get_reusable_executor(max_workers=2)
-        res = executor.submit(func, *args)
+        res = executor.submit(func, *make_args())
 
         match_err = None
         if expected_err is TerminatedWorkerError:
@@ -253,11 +335,13 @@ class TestExecutorDeadLock(ReusableExecutorMixin):
             with pytest.raises(_RemoteTraceback, match=match):
                 raise exc_info.value.__cause__
 
-    @pytest.mark.parametrize("func, args, expected_err, match", crash_cases)
-    def test_in_callback_submit_with_crash(self, func, args, expected_err,
-                                           match):
+    @pytest.mark.parametrize("func, make_args, expected_err, match",
+                             crash_cases)
+    def test_in_callback_submit_with_crash(self, func, make_args,
+                                           expected_err, match):
         """Test the recovery from callback crash"""
         executor = get_reusable_executor(max_workers=2, timeout=12)
+        args = make_args()
 
         def in_callback_submit(future):
             future2 = get_reusable_executor(
@@ -291,14 +375,13 @@ class TestExecutorDeadLock(ReusableExecutorMixin):
             with pytest.raises(_RemoteTraceback, match=match):
                 raise exc_info.value.__cause__
 
-    def test_callback_crash_on_submit(self):
+    def test_callback_crash_on_submit(self, executor):
         """Errors in the callback execution directly in queue manager thread.
 
         This case can break the process executor and we want to make sure
         that we can detect the issue and recover by calling
         get_reusable_executor.
         """
-        executor = get_reusable_executor(max_workers=2)
 
         # Make sure the first submitted job last a bit to make sure that
         # the callback will be called in the queue manager thread and not
@@ -342,10 +425,10 @@ class TestExecutorDeadLock(ReusableExecutorMixin):
         executor = get_reusable_executor(max_workers=2, timeout=None)
         assert executor.submit(id_sleep, 42, 0.).result() == 42
 
-    @pytest.mark.parametrize("n_proc", [1, 2, 5, 13])
-    def test_crash_races(self, n_proc):
-        """Test the race conditions in reusable_executor crash handling"""
-
+    @pytest.fixture
+    def race_executor(self, race_inputs):
+        """Reusable executor with n_proc running workers and no timeout"""
+        n_proc = race_inputs.n_proc
         if (sys.platform == 'win32' and sys.version_info >= (3, 8)
                 and n_proc > 5):
             pytest.skip(
@@ -354,17 +437,20 @@ class TestExecutorDeadLock(ReusableExecutorMixin):
                 "this file). Skipping while no better solution is found. See "
                 "https://github.com/joblib/loky/issues/279 for more details."
             )
+        executor = get_reusable_executor(max_workers=n_proc, timeout=None)
+        executor.map(id, range(n_proc))  # trigger the creation of the workers
+        return executor
 
+    def test_crash_races(self, race_executor, race_inputs):
+        """Test the race conditions in reusable_executor crash handling"""
         # Test for external crash signal comming from neighbor
         # with various race setup
-        executor = get_reusable_executor(max_workers=n_proc, timeout=None)
-        executor.map(id, range(n_proc))  # trigger the creation of the workers
+        executor = race_executor
         pids = list(executor._processes.keys())
-        assert len(pids) == n_proc
+        assert len(pids) == race_inputs.n_proc
         assert None not in pids
         res = executor.map(sleep_then_check_pids_exist,
-                           [(.0001 * (j // 2), pids)
-                            for j in range(2 * n_proc)])
+                           [(delay, pids) for delay in race_inputs.delays])
         assert all(list(res))
         with pytest.raises(TerminatedWorkerError,
                            match=filter_match(r"SIGKILL")):
@@ -400,8 +486,7 @@ class TestExecutorDeadLock(ReusableExecutorMixin):
             fs_fail[99].result()
         assert fs[99].result()
 
-    def test_informative_error_when_fail_at_unpickle(self):
-        executor = get_reusable_executor(max_workers=2)
+    def test_informative_error_when_fail_at_unpickle(self, executor):
         obj = ErrorAtUnpickle(RuntimeError, 'message raised in child')
         f = executor.submit(id, obj)
 
@@ -422,19 +507,22 @@ class TestExecutorDeadLock(ReusableExecutorMixin):
         executor.shutdown(wait=True)
 
 
+@pytest.mark.xdist_group(name="reusable_terminate")
 class TestTerminateExecutor(ReusableExecutorMixin):
 
     def test_shutdown_kill(self):
         """Test reusable_executor termination handling"""
         from itertools import repeat
         executor = get_reusable_executor(max_workers=5)
-        res1 = executor.map(id_sleep, range(100), repeat(.001))
-        res2 = executor.map(id_sleep, range(100), repeat(1))
+        # Use chunks of tasks to reduce the number of pickled call items: the
+        # shutdown behavior does not depend on the number of tasks.
+        res1 = executor.map(id_sleep, range(100), repeat(.001), chunksize=10)
+        res2 = executor.map(id_sleep, range(100), repeat(1), chunksize=10)
         assert list(res1) == list(range(100))
 
-        shutdown = TimingWrapper(executor.shutdown)
-        shutdown(wait=True, kill_workers=True)
-        assert shutdown.elapsed < 5
+        t_start = perf_counter()
+        executor.shutdown(wait=True, kill_workers=True)
+        assert perf_counter() - t_start < 5
 
         # We should get an error as the executor shutdowned before we fetched
         # all the results from the long running operation.
@@ -446,10 +534,12 @@ class TestTerminateExecutor(ReusableExecutorMixin):
         # Test the executor.shutdown call do not cause deadlock
         executor = get_reusable_executor(max_workers=2, timeout=None)
         executor.map(id, range(2))  # start the worker processes
-        executor.submit(kill_friend, (next(iter(executor._processes.keys())),
-                                      .0))
-        sleep(.01)
-        executor.shutdown(wait=True)
+        pid = next(iter(executor._processes.keys()))
+        with get_context().Manager() as manager:
+            event = manager.Event()
+            executor.submit(kill_friend, pid, event)
+            assert event.wait(TIMEOUT)
+            executor.shutdown(wait=True)
 
     def test_kill_workers_on_new_options(self):
         # submit a long running job with no timeout
@@ -485,6 +575,7 @@ class TestTerminateExecutor(ReusableExecutorMixin):
                 pass
 
 
+@pytest.mark.xdist_group(name="reusable_resize")
 class TestResizeExecutor(ReusableExecutorMixin):
     def test_reusable_executor_resize(self):
         """Test reusable_executor resizing"""
@@ -496,15 +587,28 @@ class TestResizeExecutor(ReusableExecutorMixin):
         # the old one as it is still in a good shape. The resize should not
         # occur while there are on going works.
         pids = list(executor._processes.keys())
-        res1 = executor.submit(sleep_then_check_pids_exist, (.3, pids))
-        clean_warning_registry()
-        with warnings.catch_warnings(record=True) as w:
-            # Cause all warnings to always be triggered.
-            warnings.simplefilter("always")
-            executor = get_reusable_executor(max_workers=1, timeout=None)
+        with get_context().Manager() as manager:
+            # The job is blocked on the barrier until the resize warns that it
+            # waits for the running jobs, which ensures that the resize is
+            # called while the job is running.
+            barrier = manager.Barrier(2)
+            res1 = executor.submit(wait_then_check_pids_exist,
+                                   (barrier, pids))
+            w = []
+
+            def release_job(message, *args, **kwargs):
+                w.append(message)
+                barrier.wait(TIMEOUT)
+
+            clean_warning_registry()
+            with warnings.catch_warnings():
+                # Cause all warnings to always be triggered.
+                warnings.simplefilter("always")
+                warnings.showwarning = release_job
+                executor = get_reusable_executor(max_workers=1, timeout=None)
             assert len(w) == 1
             expected_msg = "Trying to resize an executor with running jobs"
-            assert expected_msg in str(w[0].message)
+            assert expected_msg in str(w[0])
             assert res1.result(), ("Resize should wait for current processes "
                                    " to finish")
             assert len(executor._processes) == 1
@@ -548,16 +652,27 @@ class TestResizeExecutor(ReusableExecutorMixin):
         # Test the executor resizing called before a kill arrive
         executor = get_reusable_executor(max_workers=2, timeout=None)
         executor.map(id, range(2))  # trigger the creation of worker processes
-        pid = next(iter(executor._processes.keys()))
-        executor.submit(kill_friend, (pid, .1))
+        pid, worker = next(iter(executor._processes.items()))
+        with get_context().Manager() as manager:
+            event = manager.Event()
+            executor.submit(kill_friend, pid, event, .1)
 
-        with pytest.warns(UserWarning) as recorded_warnings:
-            warnings.simplefilter("always")
-            executor = get_reusable_executor(max_workers=1, timeout=None)
-        assert len(recorded_warnings) == 1
-        expected_msg = ("Trying to resize an executor with running jobs:"
-                        " waiting for jobs completion before resizing.")
-        assert recorded_warnings[0].message.args[0] == expected_msg
+            with pytest.warns(UserWarning) as recorded_warnings:
+                warnings.simplefilter("always")
+                executor = get_reusable_executor(max_workers=1, timeout=None)
+            assert len(recorded_warnings) == 1
+            expected_msg = ("Trying to resize an executor with running jobs:"
+                            " waiting for jobs completion before resizing.")
+            assert recorded_warnings[0].message.args[0] == expected_msg
+            assert event.wait(TIMEOUT)
+        wait_dead(worker)
+
+        # The killed worker breaks the executor: the get_reusable_executor
+        # factory should be able to create a new working instance.
+        with pytest.raises(TerminatedWorkerError,
+                           match=filter_match(r"SIGKILL")):
+            executor.submit(id_sleep, 42, 0.).result()
+        executor = get_reusable_executor(max_workers=1, timeout=None)
         assert executor.submit(id_sleep, 42, 0.).result() == 42
         executor.shutdown()
 
@@ -578,6 +693,7 @@ class TestResizeExecutor(ReusableExecutorMixin):
             assert expected_msg in recorded_warnings[0].message.args[0]
 
 
+@pytest.mark.xdist_group(name="reusable_get")
 class TestGetReusableExecutor(ReusableExecutorMixin):
 
     def test_invalid_process_number(self):
@@ -589,6 +705,27 @@ class TestGetReusableExecutor(ReusableExecutorMixin):
         with pytest.raises(ValueError):
             get_reusable_executor(max_workers=-1)
 
+        # The invalid number of workers is reported without waiting for the
+        # executor lock, held here by another thread.
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_executor_lock():
+            with loky.reusable_executor._executor_lock:
+                locked.set()
+                release.wait(TIMEOUT)
+
+        t = threading.Thread(target=hold_executor_lock)
+        t.start()
+        try:
+            assert locked.wait(TIMEOUT)
+            t_start = perf_counter()
+            with pytest.raises(ValueError):
+                get_reusable_executor(max_workers=0)
+            assert perf_counter() - t_start < TIMEOUT / 2
+        finally:
+            release.set()
+            t.join()
+
         executor = get_reusable_executor()
         with pytest.raises(ValueError):
             executor._resize(max_workers=None)
@@ -798,6 +935,7 @@ class TestGetReusableExecutor(ReusableExecutorMixin):
         assert executor4 is executor3
 
 
+@pytest.mark.xdist_group(name="reusable_initializer")
 class TestExecutorInitializer(ReusableExecutorMixin):
     def _initializer(self, x):
         loky._initialized_state = x
@@ -21,6 +21,12 @@ if sys.version_info[0] == 2:
     class TimeoutError(OSError):
         pass
 
+# Time the calls with perf_counter where available (Python 3.3+)
+if sys.version_info >= (3, 3):
+    from time import perf_counter
+else:
+    from time import time as perf_counter
+
 
 def resource_unlink(name, rtype):
     resource_tracker._CLEANUP_FUNCS[rtype](name)
@@ -102,11 +108,11 @@ class TimingWrapper(object):
         self.elapsed = None
 
     def __call__(self, *args, **kwds):
-        t = time.time()
+        t = perf_counter()
         try:
             return self.func(*args, **kwds)
         finally:
-            self.elapsed = time.time() - t
+            self.elapsed = perf_counter() - t
 
     def assert_timing_almost_equal(self, delay):
         assert round(self.elapsed - delay, 1) == 0